@@ -0,0 +1,258 @@
+"""Cargo allocation pipeline behind the Streamlit app: parse, solve, break down, export."""
+import pandas as pd
+import numpy as np
+import io
+import xlsxwriter
+from itertools import chain
+from scipy.optimize import linprog
+from scipy.sparse import csr_matrix
+
+
+# Columns the optimizer reads from each route sheet. Indirect paths are flown
+# over the (leg O-D, leg AI cap) column pairs in order; a blank leg O-D is not
+# flown. 'optional' columns may be missing from a sheet: a missing cap column
+# leaves that leg uncapped.
+ROUTE_SHEETS = {
+    'direct': {
+        'sheet_name': 0,
+        'numeric': ['CM', 'AI Share', 'AI Cap'],
+    },
+    'indirect': {
+        'sheet_name': 1,
+        'numeric': ['CM', 'AI Share', 'Max OD Cargo', '1st Leg AI Cap', '2nd Leg AI Cap'],
+        'legs': [('1st Leg O-D', '1st Leg AI Cap'), ('2nd Leg O-D', '2nd Leg AI Cap')],
+        'optional': ['2nd Leg AI Cap'],
+    },
+}
+
+# Seconds HiGHS may spend on one solve before the upload is reported as failed
+SOLVER_TIME_LIMIT = 60
+
+
+def od_keys(df):
+    """Return the OD label per row, falling back to 'Sector' where 'O-D' is blank."""
+    od = df['O-D']
+    if 'Sector' in df:
+        od = od.where(od.astype(bool), df['Sector'])
+    return od
+
+
+def numeric_columns(df, spec):
+    """The spec's numeric columns, less any optional ones the sheet does not have."""
+    optional = spec.get('optional', ())
+    return [col for col in spec['numeric'] if col in df or col not in optional]
+
+
+def numeric_frame(df, spec):
+    """The sheet's numeric columns as float64; cells that are not numbers become NaN."""
+    # apply() skips to_numeric on a header-only sheet, hence the explicit cast
+    return df[numeric_columns(df, spec)].apply(pd.to_numeric, errors='coerce').astype(np.float64)
+
+
+def read_sheet(xls, spec):
+    """Read one route sheet as entered: '-' and blanks become 0, column names are stripped."""
+    df = xls.parse(sheet_name=spec['sheet_name'], na_values=['-']).fillna(0)
+
+    # Normalize column names
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def min_by_key(keys, values):
+    """Smallest value per key as a dict, keys in first-seen order; NA keys are dropped."""
+    codes, uniques = pd.factorize(keys)
+    # factorize() codes NA keys as -1, which would sort first and shift every run
+    keep = codes >= 0
+    codes, values = codes[keep], values[keep]
+    if not len(codes):
+        return {}
+    # Sort values by key code so each key's values form one contiguous run
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+    return dict(zip(uniques, np.minimum.reduceat(values[order], starts).tolist()))
+
+
+def parse_sheets(file_bytes):
+    """Parse the direct and indirect route sheets from the uploaded workbook bytes."""
+    xls = pd.ExcelFile(io.BytesIO(file_bytes), engine='calamine')
+    return read_sheet(xls, ROUTE_SHEETS['direct']), read_sheet(xls, ROUTE_SHEETS['indirect'])
+
+
+def build_network(direct_routes, indirect_routes):
+    """Collect every OD path and the tightest AI capacity on every leg."""
+    # Process direct routes
+    spec = ROUTE_SHEETS['direct']
+    od_col = od_keys(direct_routes)
+    num = numeric_frame(direct_routes, spec)
+    valid = od_col.astype(bool) & np.isfinite(num).all(axis=1)
+    routes = num[valid]
+    od_arr = od_col[valid].to_numpy()
+    cm_arr = routes['CM'].to_numpy(dtype=np.float64)
+    ai_cap_arr = routes['AI Cap'].to_numpy(dtype=np.float64)
+    max_alloc = np.minimum(routes['AI Share'].to_numpy(dtype=np.float64), ai_cap_arr)
+    all_od_paths = {
+        od: {'legs': [od], 'cm': cm, 'max_allocable': ma, 'type': 'Direct'}
+        for od, cm, ma in zip(od_arr, cm_arr.tolist(), max_alloc.tolist())
+    }
+    # A repeated direct OD takes the AI cap of its last row
+    last = ~pd.Index(od_arr).duplicated(keep='last')
+    leg_keys, leg_caps = [od_arr[last]], [ai_cap_arr[last]]
+
+    # Process indirect routes
+    spec = ROUTE_SHEETS['indirect']
+    od_col = od_keys(indirect_routes)
+    num = numeric_frame(indirect_routes, spec)
+    valid = od_col.astype(bool) & np.isfinite(num).all(axis=1)
+    routes, num = indirect_routes[valid], num[valid]
+    od_arr = od_col[valid].to_numpy()
+    cm_arr = num['CM'].to_numpy()
+    # An OD listed on several rows is capped by the smallest 'Max OD Cargo' among them
+    max_alloc = num['Max OD Cargo'].groupby(od_col[valid]).transform('min').tolist()
+    # Blank leg cells were filled with 0; they are left out of the path and add no capacity
+    leg_cols = [leg_col for leg_col, _ in spec['legs']]
+    legs_per_od = [[leg for leg in legs if leg] for legs in routes[leg_cols].to_numpy().tolist()]
+    all_od_paths.update({
+        od: {'legs': legs, 'cm': cm, 'max_allocable': ma, 'type': 'Indirect'}
+        for od, legs, cm, ma in zip(od_arr, legs_per_od, cm_arr.tolist(), max_alloc)
+    })
+
+    for leg_col, cap_col in spec['legs']:
+        if cap_col not in num:
+            continue
+        flown = routes[leg_col].astype(bool)
+        leg_keys.append(routes.loc[flown, leg_col].to_numpy())
+        leg_caps.append(num.loc[flown, cap_col].to_numpy())
+
+    leg_capacities = min_by_key(np.concatenate(leg_keys), np.concatenate(leg_caps))
+    return all_od_paths, leg_capacities
+
+
+def build_lp(all_od_paths, leg_capacities):
+    """Assemble the LP: OD order, CM vector, leg capacity rows and per-OD upper bounds."""
+    # maximize sum(cm * x) subject to leg capacities, as a sparse LP for HiGHS
+    od_list = list(all_od_paths)
+    cm_vec = np.array([all_od_paths[od]['cm'] for od in od_list], dtype=np.float64)
+
+    # One (leg row, OD column) entry per leg flown; legs are matched as integer codes
+    leg_index = pd.Index(list(leg_capacities))
+    legs_per_od = [all_od_paths[od]['legs'] for od in od_list]
+    cols = np.repeat(np.arange(len(od_list)), [len(legs) for legs in legs_per_od])
+    rows = leg_index.get_indexer(list(chain.from_iterable(legs_per_od)))
+    on_network = rows >= 0
+    rows, cols = rows[on_network], cols[on_network]
+    b_ub = np.fromiter(leg_capacities.values(), dtype=np.float64, count=len(leg_capacities))
+    A_ub = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(leg_capacities), len(od_list)))
+
+    # Per-OD caps are variable bounds rather than constraint rows
+    ub_vec = np.array([all_od_paths[od]['max_allocable'] for od in od_list], dtype=np.float64)
+
+    return od_list, cm_vec, A_ub, b_ub, ub_vec
+
+
+def solve(direct_routes, indirect_routes):
+    """Allocate cargo over the OD paths; return the OD summary, the paths and the total profit."""
+    all_od_paths, leg_capacities = build_network(direct_routes, indirect_routes)
+    od_list, cm_vec, A_ub, b_ub, ub_vec = build_lp(all_od_paths, leg_capacities)
+
+    # If every profitable OD can take its full bound without overfilling a leg,
+    # that allocation is already optimal and the solver can be skipped
+    x = np.where(cm_vec > 0, ub_vec, 0.0)
+    if (ub_vec >= 0).all() and (A_ub @ x <= b_ub).all():
+        total_profit = float(cm_vec @ x)
+    else:
+        res = linprog(
+            -cm_vec, A_ub=A_ub, b_ub=b_ub, bounds=[(0, u) for u in ub_vec.tolist()],
+            method='highs-ds', options={'time_limit': SOLVER_TIME_LIMIT},
+        )
+        if not res.success:
+            raise ValueError(f"optimization failed: {res.message}")
+        x = res.x
+        total_profit = -res.fun
+
+    allocated = x > 0
+    tons = x[allocated]
+    df_od_summary = pd.DataFrame({
+        'OD Pair': np.array(od_list, dtype=object)[allocated],
+        'Cargo Tonnage': tons.round(2),
+        'CM (₹/ton)': cm_vec[allocated],
+        'Total Profit (₹)': (tons * cm_vec[allocated]).round(2),
+    })
+
+    return df_od_summary, all_od_paths, total_profit
+
+
+def build_leg_detail(direct_routes, indirect_routes, df_od_summary, all_od_paths):
+    """Break the optimal allocation down per flight leg, ranked by tonnage within each leg."""
+    cargo_type_map = dict(zip(indirect_routes['O-D'], indirect_routes['Cargo Type']))
+    flight_type_map = dict(zip(direct_routes['O-D'], direct_routes.get('Region','')))
+
+    # One row per (OD, leg): repeat each OD's values once per leg it flies
+    ods = df_od_summary['OD Pair'].to_numpy()
+    legs = [all_od_paths[od]['legs'] for od in ods]
+    counts = np.fromiter(map(len, legs), dtype=np.intp, count=len(legs))
+    flight_leg = np.fromiter(chain.from_iterable(legs), dtype=object, count=counts.sum())
+    od_contributor = np.repeat(ods, counts)
+    cm = np.repeat(df_od_summary['CM (₹/ton)'].to_numpy(), counts)
+    tons = np.repeat(df_od_summary['Cargo Tonnage'].to_numpy(), counts)
+    df_leg_detail = pd.DataFrame({
+        'Flight Leg': flight_leg,
+        'OD Contributor': od_contributor,
+        'OD CM (₹/ton)': cm,
+        'Cargo Tonnage': tons,
+        'Revenue from Leg (₹)': tons * cm,
+        'Type': np.where(flight_leg == od_contributor, "Direct", "Transit"),
+    })
+    df_leg_detail['Type 2'] = df_leg_detail['OD Contributor'].map(cargo_type_map).fillna("Direct")
+    df_leg_detail['Flight Type'] = df_leg_detail['Flight Leg'].map(flight_type_map).fillna("")
+
+    legs_grouped = df_leg_detail.groupby('Flight Leg', sort=False)['Cargo Tonnage']
+    df_leg_detail['Priority Type'] = np.where(legs_grouped.transform('size') == 1, "Only OD", "Based on Cargo Tonnage")
+    df_leg_detail['Fill Priority Rank'] = legs_grouped.rank(method='first', ascending=False).astype(int)
+
+    return df_leg_detail
+
+
+def summarize_legs(df_leg_detail):
+    """Total the allocated tonnage on each flight leg."""
+    return df_leg_detail.groupby('Flight Leg')['Cargo Tonnage'].sum().reset_index(name='Total Tonnage (Tons)')
+
+
+def export_xlsx(direct_routes, indirect_routes, df_od_summary, df_leg_detail, total_profit):
+    """Render the inputs and every result table as the downloadable Excel workbook."""
+    df_profit_note = pd.DataFrame([{
+        'Flight Leg': 'TOTAL NETWORK PROFIT',
+        'OD Contributor': '',
+        'OD CM (₹/ton)': '',
+        'Cargo Tonnage': '',
+        'Revenue from Leg (₹)': round(total_profit, 2),
+        'Priority Type': '',
+        'Fill Priority Rank': '',
+        'Type': '',
+        'Type 2': '',
+        'Flight Type': ''
+    }])
+
+    # constant_memory flushes each row to disk as soon as it is written, so
+    # rows must be written in order. Cells are formatted as pd.ExcelWriter would:
+    # bold headers, dates in a date format, NaN left blank (inf is written as an error)
+    output = io.BytesIO()
+    wb = xlsxwriter.Workbook(output, {
+        'constant_memory': True, 'strings_to_urls': False, 'nan_inf_to_errors': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    header_format = wb.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    for df, sheet_name in (
+        (direct_routes, "Direct_Routes_Input"),
+        (indirect_routes, "Indirect_Routes_Input"),
+        (df_od_summary, "OD_Allocations"),
+        (df_leg_detail, "Leg_Breakdown"),
+        (summarize_legs(df_leg_detail), "Leg_Summary"),
+        (df_profit_note, "Profit_Summary"),
+    ):
+        ws = wb.add_worksheet(sheet_name)
+        ws.write_row(0, 0, df.columns, header_format)
+        cells = df.astype(object).where(df.notna(), None)
+        for r, row in enumerate(cells.itertuples(index=False, name=None), start=1):
+            ws.write_row(r, 0, row)
+    wb.close()
+    return output.getvalue()
@@ -0,0 +1,106 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cargo_optimizer
+
+
+DIRECT = pd.DataFrame({
+    'O-D': ['DEL-BOM', 'BOM-BLR'],
+    'Region': ['North', 'West'],
+    'CM': [100, 80],
+    'AI Share': [50, 30],
+    'AI Cap': [40, 60],
+})
+
+# DEL-BLR flies both legs; its 2nd-leg cap (45) is tighter than BOM-BLR's own 60.
+# DEL-HYD has no second leg, which must not cap it at 0.
+INDIRECT = pd.DataFrame({
+    'O-D': ['DEL-BLR', 'DEL-HYD'],
+    'Cargo Type': ['Transit', 'TP'],
+    'CM': [150, 60],
+    'AI Share': [10, 5],
+    'Max OD Cargo': [25, 20],
+    '1st Leg O-D': ['DEL-BOM', 'DEL-HYD'],
+    '2nd Leg O-D': ['BOM-BLR', None],
+    '1st Leg AI Cap': [70, 50],
+    '2nd Leg AI Cap': [45, None],
+})
+
+
+def workbook(direct, indirect):
+    """Upload bytes with the two route sheets."""
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        direct.to_excel(writer, sheet_name='Direct', index=False)
+        indirect.to_excel(writer, sheet_name='Indirect', index=False)
+    return output.getvalue()
+
+
+def allocate(direct, indirect):
+    direct_routes, indirect_routes = cargo_optimizer.parse_sheets(workbook(direct, indirect))
+    df_od_summary, _, total_profit = cargo_optimizer.solve(direct_routes, indirect_routes)
+    return dict(zip(df_od_summary['OD Pair'], df_od_summary['Cargo Tonnage'])), total_profit
+
+
+def test_solve_applies_both_leg_caps():
+    tons, total_profit = allocate(DIRECT, INDIRECT)
+    assert tons == pytest.approx({'DEL-BOM': 25, 'BOM-BLR': 30, 'DEL-BLR': 15, 'DEL-HYD': 20})
+    assert total_profit == pytest.approx(8350)
+
+
+def test_missing_second_leg_cap_column_leaves_second_legs_uncapped():
+    tons, total_profit = allocate(DIRECT, INDIRECT.drop(columns='2nd Leg AI Cap'))
+    assert tons == pytest.approx({'DEL-BOM': 15, 'BOM-BLR': 30, 'DEL-BLR': 25, 'DEL-HYD': 20})
+    assert total_profit == pytest.approx(8850)
+
+
+def test_header_only_indirect_sheet():
+    tons, total_profit = allocate(DIRECT, INDIRECT.iloc[:0])
+    assert tons == pytest.approx({'DEL-BOM': 40, 'BOM-BLR': 30})
+    assert total_profit == pytest.approx(6400)
+
+
+def test_objective_matches_pulp_reference():
+    pulp = pytest.importorskip('pulp')
+    direct_routes, indirect_routes = cargo_optimizer.parse_sheets(workbook(DIRECT, INDIRECT))
+    all_od_paths, leg_capacities = cargo_optimizer.build_network(direct_routes, indirect_routes)
+
+    # The original app's formulation: one row per leg, per-OD caps as constraints
+    prob = pulp.LpProblem("reference", pulp.LpMaximize)
+    x_od = pulp.LpVariable.dicts("x", range(len(all_od_paths)), lowBound=0)
+    paths = list(all_od_paths.values())
+    prob += pulp.lpSum(x_od[j] * props['cm'] for j, props in enumerate(paths))
+    for leg, cap in leg_capacities.items():
+        prob += pulp.lpSum(x_od[j] for j, props in enumerate(paths) if leg in props['legs']) <= cap
+    for j, props in enumerate(paths):
+        prob += x_od[j] <= props['max_allocable']
+    prob.solve(pulp.PULP_CBC_CMD(msg=False))
+
+    _, _, total_profit = cargo_optimizer.solve(direct_routes, indirect_routes)
+    assert pulp.LpStatus[prob.status] == 'Optimal'
+    assert total_profit == pytest.approx(pulp.value(prob.objective))
+
+
+def test_export_xlsx_round_trip():
+    direct = DIRECT.assign(CM=['TBD', 80], Start=pd.to_datetime(['2025-01-01', None]))
+    direct_routes, indirect_routes = cargo_optimizer.parse_sheets(workbook(direct, INDIRECT))
+    df_od_summary, all_od_paths, total_profit = cargo_optimizer.solve(direct_routes, indirect_routes)
+    df_leg_detail = cargo_optimizer.build_leg_detail(direct_routes, indirect_routes, df_od_summary, all_od_paths)
+
+    report = pd.read_excel(io.BytesIO(cargo_optimizer.export_xlsx(
+        direct_routes, indirect_routes, df_od_summary, df_leg_detail, total_profit,
+    )), sheet_name=None)
+
+    assert list(report) == [
+        'Direct_Routes_Input', 'Indirect_Routes_Input', 'OD_Allocations',
+        'Leg_Breakdown', 'Leg_Summary', 'Profit_Summary',
+    ]
+    # Input cells are written as entered: text stays text, dates stay dates
+    assert report['Direct_Routes_Input'].loc[0, 'CM'] == 'TBD'
+    assert report['Direct_Routes_Input'].loc[0, 'Start'] == pd.Timestamp('2025-01-01')
+    pd.testing.assert_frame_equal(report['OD_Allocations'], df_od_summary, check_dtype=False)
+    assert report['Profit_Summary'].loc[0, 'Revenue from Leg (₹)'] == pytest.approx(round(total_profit, 2))
+    assert np.isclose(report['Leg_Summary']['Total Tonnage (Tons)'].sum(), df_leg_detail['Cargo Tonnage'].sum())